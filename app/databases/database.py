@@ -9,15 +9,39 @@ from alembic.config import Config
 from alembic.runtime import migration
 from alembic.script import ScriptDirectory
 from elasticsearch import Elasticsearch
-from sqlalchemy import Engine
+from elasticsearch.serializer import (
+    CompatibilityModeJsonSerializer,
+    JsonSerializer,
+    OrjsonSerializer,
+)
+from sqlalchemy import Engine, text
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, SQLModel, create_engine
 
 from utilities import envs
 
 log = logging.getLogger(__name__)
 
+
 # Initialize Elasticsearch client
-es = Elasticsearch([environ.get("ELASTICSEARCH_URL", "http://localhost:9200")])
+# The 8.x client sends compatibility-mode mimetypes, register orjson under both.
+# Bulk bodies are joined from lines already encoded by the JSON serializer, so the
+# default ndjson serializer is kept
+_orjson_serializer = OrjsonSerializer()
+es = Elasticsearch(
+    [environ.get("ELASTICSEARCH_URL", "http://localhost:9200")],
+    serializers={
+        JsonSerializer.mimetype: _orjson_serializer,
+        CompatibilityModeJsonSerializer.mimetype: _orjson_serializer,
+    },
+)
+
+# Postgres connection pool sizing
+POOL_SIZE = int(environ.get("DB_POOL_SIZE", 25))
+MAX_OVERFLOW = int(environ.get("DB_MAX_OVERFLOW", 25))
+
+# Server-wide connection count, refreshed in the background by refresh_connection_count
+connection_count: int | None = None
 
 
 def _get_engine(env: str):
@@ -39,7 +63,16 @@ def _get_engine(env: str):
         connect_args = {}
         engine = create_engine(
             DATABASE_URL,
-            echo_pool=True,
+            # Pool event logging formats a record per connection event, opt in only
+            echo_pool=environ.get("DB_ECHO_POOL") == "true",
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            # Fail fast with an error instead of queueing requests behind a full pool
+            pool_timeout=int(environ.get("DB_POOL_TIMEOUT", 10)),
+            pool_recycle=int(environ.get("DB_POOL_RECYCLE", 1800)),
+            pool_pre_ping=True,
+            # Hand out the most recently used connection to keep a small hot set
+            pool_use_lifo=True,
         )
 
     return engine
@@ -99,6 +132,28 @@ def establish_connection():
     return engine
 
 
+def refresh_connection_count():
+    """
+    Updates connection_count from pg_stat_activity
+    The view scans every backend, so this runs on a timer rather than per request
+    """
+    global connection_count
+    try:
+        with get_engine().connect() as conn:
+            connection_count = conn.execute(
+                text("SELECT COUNT(sa.*) FROM pg_catalog.pg_stat_activity sa")
+            ).scalar()
+    except Exception as e:
+        log.warning(f"Issue accessing connection count: {e}")
+
+
+def pool_status() -> str:
+    """
+    Returns the connection pool's checked in/out and overflow counts
+    """
+    return get_engine().pool.status()
+
+
 def create_session() -> Session:
     return Session(bind=get_engine())
 
@@ -150,6 +205,13 @@ def _commit_many(db_objs: list[SQLModel], db: Session):
     return db_objs
 
 
+def is_unique_violation(e: IntegrityError) -> bool:
+    """
+    Returns True if the IntegrityError was raised by a UNIQUE constraint
+    """
+    return getattr(e.orig, "pgcode", None) == "23505"
+
+
 def delete(db_objs: list[SQLModel], db: Session):
     [db.delete(o) for o in db_objs]
     db.commit()
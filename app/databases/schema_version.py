@@ -0,0 +1,89 @@
+from itertools import chain
+
+from sqlalchemy import event
+from sqlmodel import Session, select, update
+
+from app.models.enum import EnumModel, EnumValueModel
+from app.models.relationship import RelationshipAttribute, RelationshipModel
+from app.models.schema import Column, SchemaVersion, Table
+
+# Schema definition rows, record data and junctions do not bump the version
+SCHEMA_MODELS = (
+    Table,
+    Column,
+    RelationshipModel,
+    RelationshipAttribute,
+    EnumModel,
+    EnumValueModel,
+)
+
+
+def get_schema_version(session: Session) -> int:
+    """
+    Returns the shared schema version, every worker sees the same value
+    """
+    version = session.exec(
+        select(SchemaVersion.version).where(SchemaVersion.id == 1)
+    ).first()
+    return version or 0
+
+
+def init_schema_version_tracking():
+    """
+    Registers the Session listeners that bump the schema version on commit
+    Called once at startup
+    """
+    if event.contains(Session, "before_commit", _bump_schema_version):
+        return
+    event.listen(Session, "after_flush", _track_schema_flush)
+    event.listen(Session, "do_orm_execute", _track_schema_statement)
+    event.listen(Session, "before_commit", _bump_schema_version)
+    event.listen(Session, "after_rollback", _discard_schema_change)
+
+
+def _track_schema_flush(session: Session, flush_context):
+    # new/dirty/deleted still hold the pre-flush state here
+    if any(
+        isinstance(obj, SCHEMA_MODELS) for obj in chain(session.new, session.deleted)
+    ) or any(
+        isinstance(obj, SCHEMA_MODELS) and session.is_modified(obj)
+        for obj in session.dirty
+    ):
+        session.info["schema_changed"] = True
+
+
+def _track_schema_statement(orm_execute_state):
+    # Bulk insert/update/delete statements bypass the flush
+    if not (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, SCHEMA_MODELS):
+        orm_execute_state.session.info["schema_changed"] = True
+
+
+def _bump_schema_version(session: Session):
+    """
+    Bumps the shared schema version inside the committing transaction
+    This runs before commit rather than after it so the bump and the write it
+    covers land together, a worker can never see one without the other
+    """
+    # Commit flushes after this hook, flush first so pending changes are tracked
+    session.flush()
+    if not session.info.pop("schema_changed", False):
+        return
+    result = session.exec(
+        update(SchemaVersion)
+        .where(SchemaVersion.id == 1)
+        .values(version=SchemaVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        session.add(SchemaVersion(id=1, version=1))
+        session.flush()
+
+
+def _discard_schema_change(session: Session):
+    session.info.pop("schema_changed", None)
@@ -4,6 +4,7 @@ import os
 from contextlib import asynccontextmanager
 
 import pyfiglet
+from anyio import to_thread
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -18,8 +19,10 @@ load_dotenv()
 
 import app.models
 from app.databases import database
+from app.databases.schema_version import init_schema_version_tracking
 from app.routes import router
-from app.websocket import router as websocket_router
+from app.utils.elasticsearch import dropped_index_actions, flush_index_queue
+from app.websocket import websocket_endpoint
 
 log = logging.getLogger(__name__)
 
@@ -29,10 +32,16 @@ AUTH_SECRET = pwd.genword()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    init_schema_version_tracking()
+    init_threadpool()
+    stats_task = init_db_stats()
     log.info("\n" + pyfiglet.figlet_format("Mini CRM API") + "\n")
     yield
 
+    if stats_task is not None:
+        stats_task.cancel()
     handle_pending_tasks()
+    flush_index_queue()
     handle_disconnect_db()
 
 
@@ -64,6 +73,42 @@ def init_db():
     log.info("DB initialization complete\n")
 
 
+def init_db_stats() -> asyncio.Task | None:
+    """
+    Starts logging DB pool, connection and index queue stats every
+    DB_STATS_INTERVAL seconds
+    """
+    if envs.get_env() in envs.SQLITE_ENVS:
+        return None
+    return asyncio.create_task(monitor_db_connections())
+
+
+async def monitor_db_connections():
+    interval = int(os.environ.get("DB_STATS_INTERVAL", 30))
+    while True:
+        await asyncio.to_thread(database.refresh_connection_count)
+        # Logged rather than served, /health is unauthenticated
+        log.info(
+            f"DB pool: {database.pool_status()}, "
+            f"server connections: {database.connection_count}, "
+            f"dropped index actions: {dropped_index_actions()}"
+        )
+        await asyncio.sleep(interval)
+
+
+def init_threadpool():
+    """
+    Sizes the threadpool running sync endpoints to the DB connection pool
+    Every sync handler holds a thread while it waits on the DB, so fewer threads
+    than connections leaves pooled connections idle under load
+    """
+    limiter = to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(
+        limiter.total_tokens, database.POOL_SIZE + database.MAX_OVERFLOW
+    )
+    log.info(f"Threadpool size: {limiter.total_tokens}")
+
+
 def init_debugger():
     import debugpy
 
@@ -106,6 +151,8 @@ try:
         app = FastAPI(lifespan=lifespan)
 
     app.include_router(router)
+    # Registered ahead of the static mount at "/", which would otherwise match /ws
+    app.add_api_websocket_route("/ws", websocket_endpoint)
 
     if envs.get_env() in envs.HOSTED_ENVS:
         app.mount(
@@ -114,14 +161,14 @@ try:
             name="Mini CRM",
         )
 
-    app.include_router(websocket_router)
-
     app.add_middleware(SessionMiddleware, secret_key=AUTH_SECRET)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
         allow_methods=["*"],
         allow_headers=["*"],
+        # Paginated lists point at their next page in a Link header
+        expose_headers=["Link"],
     )
 
     if envs.get_env() == envs.DEV and os.environ.get("ENABLE_DEBUGGER") == "true":
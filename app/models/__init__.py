@@ -2,7 +2,7 @@ from .enum import EnumModel, EnumValueModel
 from .record import Record
 from .relationship import RelationshipAttribute, RelationshipModel
 from .relationship_junction import RelationshipJunctionModel
-from .schema import Column, Table
+from .schema import Column, SchemaVersion, Table
 from .user import Company, User
 
 __all__ = [
@@ -12,6 +12,7 @@ __all__ = [
     "RelationshipAttribute",
     "Column",
     "Table",
+    "SchemaVersion",
     "User",
     "Company",
     "Record",
@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 from typing import TYPE_CHECKING, Any, Optional
 
-from sqlalchemy import Column
+from sqlalchemy import Column, LargeBinary
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import Field, Relationship, SQLModel
 
@@ -16,6 +16,10 @@ class Record(SQLModel, table=True):
     data: dict[str, Any] = Field(sa_column=Column(JSONB))
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Digest of the document last bulk-indexed for this record
+    indexed_hash: bytes | None = Field(
+        default=None, sa_column=Column(LargeBinary(16), nullable=True)
+    )
 
     table: Optional["Table"] = Relationship(back_populates="records")
 
@@ -48,3 +48,12 @@ class Table(SQLModel, table=True):
     )
 
     records: list["Record"] = Relationship(back_populates="table")
+
+
+class SchemaVersion(SQLModel, table=True):
+    """
+    Single row counter, bumped in the same transaction as any schema or record write
+    """
+
+    id: int | None = Field(default=None, primary_key=True)
+    version: int = Field(default=0, nullable=False)
@@ -6,7 +6,7 @@ from sqlmodel import Field, Relationship, SQLModel
 
 class User(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
-    name: str
+    name: str = Field(index=True)
     email: str = Field(index=True, unique=True)
     hashed_password: str = Field(..., nullable=False)
     company_id: int | None = Field(default=None, foreign_key="company.id")
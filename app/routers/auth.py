@@ -1,11 +1,14 @@
 import os
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Optional
 
+import jwt
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
+from jwt import DecodeError, InvalidTokenError
 from passlib.context import CryptContext
+from sqlalchemy import bindparam, lambda_stmt
 from sqlmodel import Session, select
 
 from app.databases.database import get_session
@@ -21,9 +24,30 @@ SECRET_KEY = os.environ.get(
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+
+class _OrjsonJWT(jwt.PyJWT):
+    """
+    PyJWT decoder that parses the claims with orjson
+    """
+
+    def _decode_payload(self, decoded: dict[str, Any]) -> Any:
+        try:
+            payload = orjson.loads(decoded["payload"])
+        except orjson.JSONDecodeError as e:
+            raise DecodeError(f"Invalid payload string: {e}") from e
+        if not isinstance(payload, dict):
+            raise DecodeError("Invalid payload string: must be a json object")
+        return payload
+
+
+_jwt = _OrjsonJWT()
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Built and cached once, every lookup after the first skips statement construction
+_user_by_name = lambda_stmt(lambda: select(User).where(User.name == bindparam("name")))
+
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -33,8 +57,21 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+def decode_access_token(token: str) -> dict[str, Any]:
+    """
+    Verifies the token and returns its claims, raises InvalidTokenError otherwise
+    """
+    return _jwt.decode(
+        token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]}
+    )
+
+
+def get_user_by_name(session: Session, username: str) -> User | None:
+    return session.exec(_user_by_name, params={"name": username}).scalars().first()
+
+
 def authenticate_user(session: Session, username: str, password: str):
-    user = session.exec(select(User).where(User.name == username)).first()
+    user = get_user_by_name(session, username)
     if not user:
         return False
     if not verify_password(password, user.hashed_password):
@@ -62,13 +99,13 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-    except JWTError:
+    except InvalidTokenError:
         raise credentials_exception
-    user = session.exec(select(User).where(User.name == username)).first()
+    user = get_user_by_name(session, username)
     if user is None:
         raise credentials_exception
     return user
@@ -93,9 +130,11 @@ def login_for_access_token(
 @router.post("/auth/register", response_model=Token)
 def register_user(user: UserRegister, session: Session = Depends(get_session)):
     existing_user = session.exec(
-        select(User).where((User.name == user.name) | (User.email == user.email))
+        select(User.id)
+        .where((User.name == user.name) | (User.email == user.email))
+        .limit(1)
     ).first()
-    if existing_user:
+    if existing_user is not None:
         raise HTTPException(
             status_code=400, detail="Username or email already registered"
         )
@@ -1,14 +1,13 @@
-import json
-
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
-from app.databases.database import get_session
+from app.databases.database import get_session, is_unique_violation
 from app.models.enum import EnumModel, EnumValueModel
 from app.models.user import User
 from app.routers.auth import get_current_user
 from app.schemas.enum import EnumCreate, EnumRead, EnumValueCreate, EnumValueRead
-from app.websocket import manager
+from app.websocket import encode_event, manager
 
 router = APIRouter()
 
@@ -20,21 +19,19 @@ def create_enum(
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
-    # Check if enum with the same name already exists
-    existing_enum = session.exec(
-        select(EnumModel).where(EnumModel.name == enum.name)
-    ).first()
-    if existing_enum:
-        raise HTTPException(
-            status_code=400, detail="Enum with this name already exists"
-        )
-
-    # Create EnumModel
+    # Create EnumModel, duplicate names are caught by the unique constraint
     db_enum = EnumModel(name=enum.name)
     session.add(db_enum)
     try:
         session.commit()
         session.refresh(db_enum)
+    except IntegrityError as e:
+        session.rollback()
+        if is_unique_violation(e):
+            raise HTTPException(
+                status_code=400, detail="Enum with this name already exists"
+            ) from e
+        raise HTTPException(status_code=400, detail="Enum creation failed") from e
     except Exception as e:
         session.rollback()
         raise HTTPException(status_code=400, detail="Enum creation failed") from e
@@ -55,13 +52,11 @@ def create_enum(
     # Broadcast schema update
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "schema_update",
-                "action": "create_enum",
-                "enum": db_enum.name,
-                "values": [v.value for v in db_enum.values],
-            }
+        encode_event(
+            "schema_update",
+            "create_enum",
+            enum=db_enum.name,
+            values=[v.value for v in db_enum.values],
         ),
     )
 
@@ -151,13 +146,11 @@ def update_enum(
     # Broadcast schema update
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "schema_update",
-                "action": "update_enum",
-                "enum": db_enum.name,
-                "values": [v.value for v in db_enum.values],
-            }
+        encode_event(
+            "schema_update",
+            "update_enum",
+            enum=db_enum.name,
+            values=[v.value for v in db_enum.values],
         ),
     )
 
@@ -190,13 +183,7 @@ def delete_enum(
     # Broadcast schema update
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "schema_update",
-                "action": "delete_enum",
-                "enum": enum_name,
-            }
-        ),
+        encode_event("schema_update", "delete_enum", enum=enum_name),
     )
 
     return {"ok": True}
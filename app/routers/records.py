@@ -1,4 +1,3 @@
-import json
 from datetime import datetime, timezone
 from typing import Any
 
@@ -15,7 +14,8 @@ from app.models.user import User
 from app.routers.auth import get_current_user
 from app.schemas.schema import RecordCreate, RecordRead
 from app.utils.elasticsearch import index_record, remove_record_from_index
-from app.websocket import manager
+from app.utils.responses import PydanticResponse, dump_list_json
+from app.websocket import encode_event, manager
 
 router = APIRouter()
 
@@ -83,6 +83,29 @@ def validate_record_data(table: Table, data: dict[str, Any], session: Session):
         raise HTTPException(status_code=400, detail=errors)
 
 
+def fetch_related_table_ids(
+    relationships: list[RelationshipModel], data: dict[str, Any], session: Session
+) -> dict[int, int]:
+    """
+    Returns {record id: table id} for every to_record_id referenced in the data
+    One IN query up front instead of a session.get per related record
+    """
+    to_record_ids = set()
+    for rel in relationships:
+        related_data = data.get(rel.name)
+        items = related_data if isinstance(related_data, list) else [related_data]
+        for item in items:
+            if isinstance(item, dict) and item.get("to_record_id") is not None:
+                to_record_ids.add(item["to_record_id"])
+    if not to_record_ids:
+        return {}
+    return dict(
+        session.exec(
+            select(Record.id, Record.table_id).where(Record.id.in_(to_record_ids))
+        ).all()
+    )
+
+
 @router.post("/records/{table_name}/", response_model=RecordRead)
 def create_record(
     table_name: str,
@@ -111,6 +134,7 @@ def create_record(
     relationships = session.exec(
         select(RelationshipModel).where(RelationshipModel.from_table_id == table.id)
     ).all()
+    related_table_ids = fetch_related_table_ids(relationships, record.data, session)
     for rel in relationships:
         related_data = record.data.get(rel.name)
         if related_data:
@@ -124,9 +148,8 @@ def create_record(
                 for item in related_data:
                     to_record_id = item.get("to_record_id")
                     attributes = {k: v for k, v in item.items() if k != "to_record_id"}
-                    # Validate that the to_record exists
-                    to_record = session.get(Record, to_record_id)
-                    if not to_record or to_record.table_id != rel.to_table_id:
+                    # Validate that the to_record exists in the target table
+                    if related_table_ids.get(to_record_id) != rel.to_table_id:
                         raise HTTPException(
                             status_code=400,
                             detail=f"Related record with id {to_record_id} does not exist in table '{rel.to_table_id}'.",
@@ -149,9 +172,8 @@ def create_record(
                 for item in related_data:
                     to_record_id = item.get("to_record_id")
                     attributes = {k: v for k, v in item.items() if k != "to_record_id"}
-                    # Validate that the to_record exists
-                    to_record = session.get(Record, to_record_id)
-                    if not to_record or to_record.table_id != rel.to_table_id:
+                    # Validate that the to_record exists in the target table
+                    if related_table_ids.get(to_record_id) != rel.to_table_id:
                         raise HTTPException(
                             status_code=400,
                             detail=f"Related record with id {to_record_id} does not exist in table '{rel.to_table_id}'.",
@@ -175,9 +197,8 @@ def create_record(
                 attributes = {
                     k: v for k, v in related_data.items() if k != "to_record_id"
                 }
-                # Validate that the to_record exists
-                to_record = session.get(Record, to_record_id)
-                if not to_record or to_record.table_id != rel.to_table_id:
+                # Validate that the to_record exists in the target table
+                if related_table_ids.get(to_record_id) != rel.to_table_id:
                     raise HTTPException(
                         status_code=400,
                         detail=f"Related record with id {to_record_id} does not exist in table '{rel.to_table_id}'.",
@@ -218,21 +239,14 @@ def create_record(
         key: value for key, value in record.data.items() if key in searchable_fields
     }
     if searchable_data:
-        background_tasks.add_task(index_record, db_record, searchable_data)
+        index_record(table_name, db_record, searchable_data)
 
     # Broadcast data update
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "data_update",
-                "action": "create",
-                "table": table_name,
-                "id": db_record.id,
-            }
-        ),
+        encode_event("data_update", "create", table=table_name, id=db_record.id),
     )
-    return db_record
+    return PydanticResponse(RecordRead.model_validate(db_record))
 
 
 @router.get("/records/{table_name}/", response_model=list[RecordRead])
@@ -241,11 +255,11 @@ def read_records(
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
-    table = session.exec(select(Table).where(Table.name == table_name)).first()
-    if not table:
+    table_id = session.exec(select(Table.id).where(Table.name == table_name)).first()
+    if table_id is None:
         raise HTTPException(status_code=404, detail="Table not found")
-    records = session.exec(select(Record).where(Record.table_id == table.id)).all()
-    return records
+    records = session.exec(select(Record).where(Record.table_id == table_id)).all()
+    return PydanticResponse(dump_list_json(RecordRead, records))
 
 
 @router.put("/records/{table_name}/{record_id}/", response_model=RecordRead)
@@ -273,6 +287,8 @@ def update_record(
     # Update fields
     db_record.data = record.data
     db_record.updated_at = datetime.now(timezone.utc)
+    # The new document goes through the index queue, forget the bulk-indexed one
+    db_record.indexed_hash = None
     session.add(db_record)
     try:
         session.commit()
@@ -285,6 +301,7 @@ def update_record(
     relationships = session.exec(
         select(RelationshipModel).where(RelationshipModel.from_table_id == table.id)
     ).all()
+    related_table_ids = fetch_related_table_ids(relationships, record.data, session)
     for rel in relationships:
         related_data = record.data.get(rel.name)
         if related_data is not None:
@@ -305,9 +322,8 @@ def update_record(
                 for item in related_data:
                     to_record_id = item.get("to_record_id")
                     attributes = {k: v for k, v in item.items() if k != "to_record_id"}
-                    # Validate that the to_record exists
-                    to_record = session.get(Record, to_record_id)
-                    if not to_record or to_record.table_id != rel.to_table_id:
+                    # Validate that the to_record exists in the target table
+                    if related_table_ids.get(to_record_id) != rel.to_table_id:
                         raise HTTPException(
                             status_code=400,
                             detail=f"Related record with id {to_record_id} does not exist in table '{rel.to_table_id}'.",
@@ -337,9 +353,8 @@ def update_record(
                 for item in related_data:
                     to_record_id = item.get("to_record_id")
                     attributes = {k: v for k, v in item.items() if k != "to_record_id"}
-                    # Validate that the to_record exists
-                    to_record = session.get(Record, to_record_id)
-                    if not to_record or to_record.table_id != rel.to_table_id:
+                    # Validate that the to_record exists in the target table
+                    if related_table_ids.get(to_record_id) != rel.to_table_id:
                         raise HTTPException(
                             status_code=400,
                             detail=f"Related record with id {to_record_id} does not exist in table '{rel.to_table_id}'.",
@@ -363,9 +378,8 @@ def update_record(
                 attributes = {
                     k: v for k, v in related_data.items() if k != "to_record_id"
                 }
-                # Validate that the to_record exists
-                to_record = session.get(Record, to_record_id)
-                if not to_record or to_record.table_id != rel.to_table_id:
+                # Validate that the to_record exists in the target table
+                if related_table_ids.get(to_record_id) != rel.to_table_id:
                     raise HTTPException(
                         status_code=400,
                         detail=f"Related record with id {to_record_id} does not exist in table '{rel.to_table_id}'.",
@@ -407,21 +421,14 @@ def update_record(
         key: value for key, value in record.data.items() if key in searchable_fields
     }
     if searchable_data:
-        background_tasks.add_task(index_record, db_record, searchable_data)
+        index_record(table_name, db_record, searchable_data)
 
     # Broadcast data update
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "data_update",
-                "action": "update",
-                "table": table_name,
-                "id": db_record.id,
-            }
-        ),
+        encode_event("data_update", "update", table=table_name, id=db_record.id),
     )
-    return db_record
+    return PydanticResponse(RecordRead.model_validate(db_record))
 
 
 @router.delete("/records/{table_name}/{record_id}/")
@@ -465,19 +472,12 @@ def delete_record(
     session.commit()
 
     # Remove from Elasticsearch if indexed
-    background_tasks.add_task(remove_record_from_index, db_record)
+    remove_record_from_index(table_name, record_id)
 
     # Broadcast data update
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "data_update",
-                "action": "delete",
-                "table": table_name,
-                "id": record_id,
-            }
-        ),
+        encode_event("data_update", "delete", table=table_name, id=record_id),
     )
     return {"ok": True}
 
@@ -489,15 +489,16 @@ def search_records(
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
-    table = session.exec(select(Table).where(Table.name == table_name)).first()
-    if not table:
+    table_id = session.exec(select(Table.id).where(Table.name == table_name)).first()
+    if table_id is None:
         raise HTTPException(status_code=404, detail="Table not found")
 
-    # Fetch searchable columns
-    columns = session.exec(
-        select(Column).where(Column.table_id == table.id, Column.searchable == True)
+    # Fetch searchable column names
+    searchable_fields = session.exec(
+        select(Column.name).where(
+            Column.table_id == table_id, Column.searchable == True
+        )
     ).all()
-    searchable_fields = [col.name for col in columns]
     if not searchable_fields:
         raise HTTPException(
             status_code=400, detail="No searchable fields defined for this table"
@@ -506,7 +507,7 @@ def search_records(
     # Perform search in Elasticsearch
     from app.utils.elasticsearch import es_client, get_index_name
 
-    index_name = get_index_name(table.name)
+    index_name = get_index_name(table_name)
     try:
         es_resp = es_client.search(
             index=index_name,
@@ -525,6 +526,6 @@ def search_records(
         return []
 
     records = session.exec(
-        select(Record).where(Record.id.in_(record_ids), Record.table_id == table.id)
+        select(Record).where(Record.id.in_(record_ids), Record.table_id == table_id)
     ).all()
-    return records
+    return PydanticResponse(dump_list_json(RecordRead, records))
@@ -1,9 +1,9 @@
-import json
-
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import Session, select
 
-from app.databases.database import get_session
+from app.databases.database import get_session, is_unique_violation
 from app.models.relationship import RelationshipAttribute, RelationshipModel
 from app.models.schema import Column, Table
 from app.models.user import User
@@ -13,7 +13,7 @@ from app.schemas.relationship import (
     RelationshipCreate,
     RelationshipRead,
 )
-from app.websocket import manager
+from app.websocket import encode_event, manager
 
 router = APIRouter()
 
@@ -40,15 +40,6 @@ def create_relationship(
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
-    # Check if relationship with the same name exists
-    existing_relationship = session.exec(
-        select(RelationshipModel).where(RelationshipModel.name == relationship.name)
-    ).first()
-    if existing_relationship:
-        raise HTTPException(
-            status_code=400, detail="Relationship with this name already exists"
-        )
-
     # Verify that from_table and to_table exist
     from_table, to_table = fetch_tables_from_create(relationship, session)
     if not from_table or not to_table:
@@ -62,9 +53,19 @@ def create_relationship(
         relationship_type=relationship.relationship_type,
     )
     session.add(db_relationship)
+    # Duplicate names are caught by the unique constraint on commit
     try:
         session.commit()
         session.refresh(db_relationship)
+    except IntegrityError as e:
+        session.rollback()
+        if is_unique_violation(e):
+            raise HTTPException(
+                status_code=400, detail="Relationship with this name already exists"
+            ) from e
+        raise HTTPException(
+            status_code=400, detail="Relationship creation failed"
+        ) from e
     except Exception as e:
         session.rollback()
         raise HTTPException(
@@ -91,27 +92,25 @@ def create_relationship(
     # Broadcast schema update
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "schema_update",
-                "action": "create_relationship",
-                "relationship": {
-                    "id": db_relationship.id,
-                    "name": db_relationship.name,
-                    "from_table": db_relationship.from_table.name,
-                    "to_table": db_relationship.to_table.name,
-                    "relationship_type": db_relationship.relationship_type,
-                    "attributes": [
-                        {
-                            "id": attr.id,
-                            "name": attr.name,
-                            "data_type": attr.data_type,
-                            "constraints": attr.constraints,
-                        }
-                        for attr in db_relationship.attributes
-                    ],
-                },
-            }
+        encode_event(
+            "schema_update",
+            "create_relationship",
+            relationship={
+                "id": db_relationship.id,
+                "name": db_relationship.name,
+                "from_table": db_relationship.from_table.name,
+                "to_table": db_relationship.to_table.name,
+                "relationship_type": db_relationship.relationship_type,
+                "attributes": [
+                    {
+                        "id": attr.id,
+                        "name": attr.name,
+                        "data_type": attr.data_type,
+                        "constraints": attr.constraints,
+                    }
+                    for attr in db_relationship.relationship_attributes
+                ],
+            },
         ),
     )
 
@@ -135,14 +134,12 @@ def create_relationship(
                 # Broadcast schema update for the searchable column
                 background_tasks.add_task(
                     manager.broadcast,
-                    json.dumps(
-                        {
-                            "type": "schema_update",
-                            "action": "update_column",
-                            "table": to_table.name,
-                            "column": name_column.name,
-                            "searchable": name_column.searchable,
-                        }
+                    encode_event(
+                        "schema_update",
+                        "update_column",
+                        table=to_table.name,
+                        column=name_column.name,
+                        searchable=name_column.searchable,
                     ),
                 )
             except Exception as e:
@@ -159,7 +156,7 @@ def create_relationship(
         relationship_type=db_relationship.relationship_type,
         attributes=[
             RelationshipAttributeRead.model_validate(attr)
-            for attr in db_relationship.attributes
+            for attr in db_relationship.relationship_attributes
         ],
     )
 
@@ -169,17 +166,25 @@ def read_relationships(
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
-    relationships = session.exec(select(RelationshipModel)).all()
+    # Attributes for every relationship in one SELECT ... IN, not one query per row
+    relationships = session.exec(
+        select(RelationshipModel).options(
+            selectinload(RelationshipModel.relationship_attributes)
+        )
+    ).all()
+    # Resolve table names from one (id, name) query instead of lazy-loading both
+    # ends per row
+    table_names = dict(session.exec(select(Table.id, Table.name)).all())
     return [
         RelationshipRead(
             id=rel.id,
             name=rel.name,
-            from_table=rel.from_table.name,
-            to_table=rel.to_table.name,
+            from_table=table_names[rel.from_table_id],
+            to_table=table_names[rel.to_table_id],
             relationship_type=rel.relationship_type,
             attributes=[
                 RelationshipAttributeRead.model_validate(attr)
-                for attr in rel.attributes
+                for attr in rel.relationship_attributes
             ],
         )
         for rel in relationships
@@ -192,7 +197,15 @@ def read_relationship(
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
-    relationship = session.get(RelationshipModel, relationship_id)
+    relationship = session.get(
+        RelationshipModel,
+        relationship_id,
+        options=[
+            joinedload(RelationshipModel.from_table),
+            joinedload(RelationshipModel.to_table),
+            selectinload(RelationshipModel.relationship_attributes),
+        ],
+    )
     if not relationship:
         raise HTTPException(status_code=404, detail="Relationship not found")
     return RelationshipRead(
@@ -203,7 +216,7 @@ def read_relationship(
         relationship_type=relationship.relationship_type,
         attributes=[
             RelationshipAttributeRead.model_validate(attr)
-            for attr in relationship.attributes
+            for attr in relationship.relationship_attributes
         ],
     )
 
@@ -236,7 +249,9 @@ def update_relationship(
         raise HTTPException(status_code=400, detail="Relationship update failed") from e
 
     # Update attributes
-    existing_attributes = {attr.name: attr for attr in db_relationship.attributes}
+    existing_attributes = {
+        attr.name: attr for attr in db_relationship.relationship_attributes
+    }
     new_attributes = {attr.name: attr for attr in relationship.attributes}
 
     # Add new attributes
@@ -274,27 +289,25 @@ def update_relationship(
     # Broadcast schema update
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "schema_update",
-                "action": "update_relationship",
-                "relationship": {
-                    "id": db_relationship.id,
-                    "name": db_relationship.name,
-                    "from_table": db_relationship.from_table.name,
-                    "to_table": db_relationship.to_table.name,
-                    "relationship_type": db_relationship.relationship_type,
-                    "attributes": [
-                        {
-                            "id": attr.id,
-                            "name": attr.name,
-                            "data_type": attr.data_type,
-                            "constraints": attr.constraints,
-                        }
-                        for attr in db_relationship.attributes
-                    ],
-                },
-            }
+        encode_event(
+            "schema_update",
+            "update_relationship",
+            relationship={
+                "id": db_relationship.id,
+                "name": db_relationship.name,
+                "from_table": db_relationship.from_table.name,
+                "to_table": db_relationship.to_table.name,
+                "relationship_type": db_relationship.relationship_type,
+                "attributes": [
+                    {
+                        "id": attr.id,
+                        "name": attr.name,
+                        "data_type": attr.data_type,
+                        "constraints": attr.constraints,
+                    }
+                    for attr in db_relationship.relationship_attributes
+                ],
+            },
         ),
     )
 
@@ -306,7 +319,7 @@ def update_relationship(
         relationship_type=db_relationship.relationship_type,
         attributes=[
             RelationshipAttributeRead.model_validate(attr)
-            for attr in db_relationship.attributes
+            for attr in db_relationship.relationship_attributes
         ],
     )
 
@@ -335,12 +348,10 @@ def delete_relationship(
     # Broadcast schema update
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "schema_update",
-                "action": "delete_relationship",
-                "relationship": relationship_name,
-            }
+        encode_event(
+            "schema_update",
+            "delete_relationship",
+            relationship=relationship_name,
         ),
     )
 
@@ -1,20 +1,79 @@
-import json
+import hashlib
+from collections import defaultdict
 from typing import Any
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from sqlmodel import Session, select
-
-from app.databases.database import get_session
-from app.models import Column, EnumModel, Table
+import orjson
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Header,
+    HTTPException,
+    Response,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+from sqlmodel import Session, delete, select
+
+from app.databases.database import get_session, is_unique_violation
+from app.databases.schema_version import get_schema_version
+from app.models.enum import EnumModel
+from app.models.record import Record
 from app.models.relationship import RelationshipModel
+from app.models.relationship_junction import RelationshipJunctionModel
 from app.models.schema import Column, Table
 from app.models.user import User
 from app.routers.auth import get_current_user
 from app.schemas.schema import ColumnCreate, ColumnRead, TableCreate, TableRead
-from app.websocket import manager
+from app.utils.elasticsearch import index_existing_records
+from app.utils.responses import PydanticResponse, dump_list_json
+from app.websocket import encode_event, manager
 
 router = APIRouter()
 
+# Tables, columns, relationships and enums of /current_schema/, tagged with the
+# schema version they were built from. Records and junctions are read per request
+_schema_cache: tuple[int, dict[str, Any]] | None = None
+
+
+# Pre-serialized body for the constant delete responses
+_OK_BODY = b'{"ok":true}'
+
+# Constraint prefixes keyed by (required, unique)
+_CONSTRAINT_PREFIX = {
+    (False, False): "",
+    (True, False): "NOT NULL",
+    (False, True): "UNIQUE",
+    (True, True): "NOT NULL UNIQUE",
+}
+
+
+def _build_constraints(required: bool, unique: bool, extra: str | None) -> str | None:
+    """
+    Builds the constraints string from 'required', 'unique' and custom constraints
+    """
+    prefix = _CONSTRAINT_PREFIX[(required, unique)]
+    if extra:
+        return f"{prefix} {extra}" if prefix else extra
+    return prefix or None
+
+
+def _column_fields(column: ColumnCreate) -> dict[str, Any]:
+    """
+    Returns the Column fields set from a ColumnCreate, shared by create and update
+    """
+    return {
+        "name": column.name,
+        "data_type": column.data_type,
+        "constraints": _build_constraints(
+            column.required, column.unique, column.constraints
+        ),
+        "required": column.required,
+        "unique": column.unique,
+        "enum_id": column.enum_id,
+        "searchable": column.searchable,
+    }
+
 
 @router.post("/tables/", response_model=TableRead)
 def create_table_endpoint(
@@ -23,40 +82,38 @@ def create_table_endpoint(
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
-    existing_table = session.exec(select(Table).where(Table.name == table.name)).first()
-    if existing_table:
-        raise HTTPException(
-            status_code=400, detail="Table with this name already exists"
-        )
     db_table = Table(name=table.name)
     session.add(db_table)
     try:
+        # The INSERT returns the new id, so the response is built without a refresh
+        session.flush()
+        table_read = TableRead.model_validate(db_table)
         session.commit()
-        session.refresh(db_table)
         # Alembic handles migrations, so no need to call create_table here
+    except IntegrityError as e:
+        session.rollback()
+        if is_unique_violation(e):
+            raise HTTPException(
+                status_code=400, detail="Table with this name already exists"
+            ) from e
+        raise HTTPException(status_code=400, detail="Table creation failed") from e
     except Exception as e:
         session.rollback()
         raise HTTPException(status_code=400, detail="Table creation failed") from e
     # Broadcast schema update
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "schema_update",
-                "action": "create_table",
-                "table": db_table.name,
-            }
-        ),
+        encode_event("schema_update", "create_table", table=table_read.name),
     )
-    return db_table
+    return PydanticResponse(table_read)
 
 
 @router.get("/tables/", response_model=list[TableRead])
 def read_tables(
     session: Session = Depends(get_session), user: User = Depends(get_current_user)
 ):
-    tables = session.exec(select(Table)).all()
-    return tables
+    tables = session.exec(select(Table).options(raiseload("*"))).all()
+    return PydanticResponse(dump_list_json(TableRead, tables))
 
 
 @router.delete("/tables/{table_id}")
@@ -66,12 +123,13 @@ def delete_table_endpoint(
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
-    table = session.get(Table, table_id)
-    if not table:
+    table_name = session.exec(select(Table.name).where(Table.id == table_id)).first()
+    if table_name is None:
         raise HTTPException(status_code=404, detail="Table not found")
-    table_name = table.name
-    session.delete(table)
     try:
+        # Columns go in one statement instead of being loaded and deleted row by row
+        session.exec(delete(Column).where(Column.table_id == table_id))
+        session.exec(delete(Table).where(Table.id == table_id))
         session.commit()
         # Alembic handles migrations, so no need to call drop_table here
     except Exception as e:
@@ -80,15 +138,26 @@ def delete_table_endpoint(
     # Broadcast schema update
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "schema_update",
-                "action": "delete_table",
-                "table": table_name,
-            }
-        ),
+        encode_event("schema_update", "delete_table", table=table_name),
     )
-    return {"ok": True}
+    return Response(content=_OK_BODY, media_type="application/json")
+
+
+@router.post("/tables/{table_id}/reindex/", status_code=202)
+def reindex_table_endpoint(
+    table_id: int,
+    background_tasks: BackgroundTasks,
+    session: Session = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    """
+    Resends every record of the table to Elasticsearch, ignoring stored hashes
+    """
+    table_name = session.exec(select(Table.name).where(Table.id == table_id)).first()
+    if table_name is None:
+        raise HTTPException(status_code=404, detail="Table not found")
+    background_tasks.add_task(index_existing_records, table_id, force=True)
+    return Response(content=_OK_BODY, media_type="application/json", status_code=202)
 
 
 # Column CRUD
@@ -103,54 +172,36 @@ def create_column_endpoint(
     table = session.get(Table, table_id)
     if not table:
         raise HTTPException(status_code=404, detail="Table not found")
-    # Check if column already exists
-    existing_column = session.exec(
-        select(Column).where(Column.table_id == table_id, Column.name == column.name)
-    ).first()
-    if existing_column:
-        raise HTTPException(status_code=400, detail="Column already exists")
-    # Build constraints string based on 'required' and 'unique'
-    constraints = []
-    if column.required:
-        constraints.append("NOT NULL")
-    if column.unique:
-        constraints.append("UNIQUE")
-    if column.constraints:
-        constraints.append(column.constraints)
-    constraints_str = " ".join(constraints) if constraints else None
-
-    db_column = Column(
-        table_id=table_id,
-        name=column.name,
-        data_type=column.data_type,
-        constraints=constraints_str,
-        required=column.required,
-        unique=column.unique,
-        enum_id=column.enum_id,
-        searchable=column.searchable,  # Handle searchable flag
-    )
+
+    db_column = Column(table_id=table_id, **_column_fields(column))
     session.add(db_column)
+    table_name = table.name
     try:
+        # The INSERT returns the new id, so the response is built without a refresh
+        session.flush()
+        column_read = ColumnRead.model_validate(db_column)
         session.commit()
-        session.refresh(db_column)
         # Alembic handles migrations, so no need to call add_column here
+    except IntegrityError as e:
+        session.rollback()
+        if is_unique_violation(e):
+            raise HTTPException(status_code=400, detail="Column already exists") from e
+        raise HTTPException(status_code=400, detail="Column creation failed") from e
     except Exception as e:
         session.rollback()
         raise HTTPException(status_code=400, detail="Column creation failed") from e
     # Broadcast schema update
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "schema_update",
-                "action": "create_column",
-                "table": table.name,
-                "column": db_column.name,
-                "searchable": db_column.searchable,
-            }
+        encode_event(
+            "schema_update",
+            "create_column",
+            table=table_name,
+            column=column_read.name,
+            searchable=column_read.searchable,
         ),
     )
-    return db_column
+    return PydanticResponse(column_read)
 
 
 @router.get("/tables/{table_id}/columns/", response_model=list[ColumnRead])
@@ -162,8 +213,10 @@ def read_columns(
     table = session.get(Table, table_id)
     if not table:
         raise HTTPException(status_code=404, detail="Table not found")
-    columns = session.exec(select(Column).where(Column.table_id == table_id)).all()
-    return columns
+    columns = session.exec(
+        select(Column).where(Column.table_id == table_id).options(raiseload("*"))
+    ).all()
+    return PydanticResponse(dump_list_json(ColumnRead, columns))
 
 
 @router.delete("/columns/{column_id}")
@@ -173,10 +226,12 @@ def delete_column_endpoint(
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
-    column = session.get(Column, column_id)
+    column = session.exec(
+        select(Column).where(Column.id == column_id).options(joinedload(Column.table))
+    ).first()
     if not column:
         raise HTTPException(status_code=404, detail="Column not found")
-    table = session.get(Table, column.table_id)
+    table_name = column.table.name
     column_name = column.name
     session.delete(column)
     try:
@@ -187,16 +242,14 @@ def delete_column_endpoint(
         raise HTTPException(status_code=400, detail="Column deletion failed") from e
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "schema_update",
-                "action": "delete_column",
-                "table": table.name,
-                "column": column_name,
-            }
+        encode_event(
+            "schema_update",
+            "delete_column",
+            table=table_name,
+            column=column_name,
         ),
     )
-    return {"ok": True}
+    return Response(content=_OK_BODY, media_type="application/json")
 
 
 @router.put("/columns/{column_id}/", response_model=ColumnRead)
@@ -207,33 +260,30 @@ def update_column_endpoint(
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
-    db_column = session.get(Column, column_id)
+    db_column = session.exec(
+        select(Column).where(Column.id == column_id).options(joinedload(Column.table))
+    ).first()
     if not db_column:
         raise HTTPException(status_code=404, detail="Column not found")
+    table_name = db_column.table.name
+
+    fields = _column_fields(column)
 
-    # Build constraints string based on 'required' and 'unique'
-    constraints = []
-    if column.required:
-        constraints.append("NOT NULL")
-    if column.unique:
-        constraints.append("UNIQUE")
-    if column.constraints:
-        constraints.append(column.constraints)
-    constraints_str = " ".join(constraints) if constraints else None
+    # Nothing to write, broadcast or invalidate when the PUT repeats the current state
+    if all(getattr(db_column, key) == value for key, value in fields.items()):
+        return PydanticResponse(ColumnRead.model_validate(db_column))
+
+    # Records written before the column was searchable were never indexed for it
+    newly_searchable = column.searchable and not db_column.searchable
 
     # Update fields
-    db_column.name = column.name
-    db_column.data_type = column.data_type
-    db_column.constraints = constraints_str
-    db_column.required = column.required
-    db_column.unique = column.unique
-    db_column.enum_id = column.enum_id
-    db_column.searchable = column.searchable  # Update searchable flag
+    for key, value in fields.items():
+        setattr(db_column, key, value)
 
     session.add(db_column)
+    column_read = ColumnRead.model_validate(db_column)
     try:
         session.commit()
-        session.refresh(db_column)
         # Alembic handles migrations, so no need to call update_column here
     except Exception as e:
         session.rollback()
@@ -241,152 +291,243 @@ def update_column_endpoint(
 
     background_tasks.add_task(
         manager.broadcast,
-        json.dumps(
-            {
-                "type": "schema_update",
-                "action": "update_column",
-                "table": db_column.table.name,
-                "column": db_column.name,
-                "searchable": db_column.searchable,
-            }
+        encode_event(
+            "schema_update",
+            "update_column",
+            table=table_name,
+            column=column_read.name,
+            searchable=column_read.searchable,
         ),
     )
 
-    return db_column
+    if newly_searchable:
+        background_tasks.add_task(
+            index_existing_records, column_read.table_id, column_read.name
+        )
+
+    return PydanticResponse(column_read)
 
 
 @router.get("/current_schema/", response_model=dict[str, Any])
-def get_current_schema(session: Session = Depends(get_session)):
+def get_current_schema(
+    session: Session = Depends(get_session),
+    if_none_match: str | None = Header(default=None),
+):
+    global _schema_cache
+
     try:
-        schema = {}
-        tables = session.exec(select(Table)).all()
-        for table in tables:
-            table_info = {
-                "id": table.id,
-                "name": table.name,
-                "columns": [],
-                "relationships_from": [],
-                "relationships_to": [],
-                "records": [],
-            }
+        # Read the version before querying, so a concurrent write can only mark us
+        # stale
+        version = get_schema_version(session)
+        cached = _schema_cache
+        if cached is not None and cached[0] == version:
+            definition = cached[1]
+        else:
+            definition = _build_schema_definition(session)
+            _schema_cache = (version, definition)
+        content = orjson.dumps(_add_schema_data(session, definition))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-            # Columns
-            for column in table.columns:
-                column_info = {
-                    "id": column.id,
-                    "name": column.name,
-                    "data_type": column.data_type,
-                    "constraints": column.constraints,
-                    "enum_id": column.enum_id,
-                    "required": column.required,
-                    "unique": column.unique,
-                    "searchable": column.searchable,
-                    "created_at": column.created_at.isoformat(),
-                    "updated_at": column.updated_at.isoformat(),
-                }
-                table_info["columns"].append(column_info)
-
-            # Relationships From
-            for rel in table.relationships_from:
-                rel_info = {
-                    "id": rel.id,
-                    "name": rel.name,
-                    "relationship_type": rel.relationship_type.value,
-                    "to_table_id": rel.to_table_id,
-                    "attributes": [
-                        {
-                            "id": attr.id,
-                            "name": attr.name,
-                            "data_type": attr.data_type,
-                            "constraints": attr.constraints,
-                        }
-                        for attr in rel.relationship_attributes
-                    ],
-                    "junctions": [
-                        {
-                            "id": junction.id,
-                            "relationship_id": junction.relationship_id,
-                            "from_record_id": junction.from_record_id,
-                            "to_record_id": junction.to_record_id,
-                            "attributes": junction.attributes,  # Already a dict
-                        }
-                        for junction in rel.junctions
-                    ],
-                }
-                table_info["relationships_from"].append(rel_info)
-
-            # Relationships To
-            for rel in table.relationships_to:
-                rel_info = {
-                    "id": rel.id,
-                    "name": rel.name,
-                    "relationship_type": rel.relationship_type.value,
-                    "from_table_id": rel.from_table_id,
-                    "attributes": [
-                        {
-                            "id": attr.id,
-                            "name": attr.name,
-                            "data_type": attr.data_type,
-                            "constraints": attr.constraints,
-                        }
-                        for attr in rel.relationship_attributes
-                    ],
-                    "junctions": [
-                        {
-                            "id": junction.id,
-                            "relationship_id": junction.relationship_id,
-                            "from_record_id": junction.from_record_id,
-                            "to_record_id": junction.to_record_id,
-                            "attributes": junction.attributes,  # Already a dict
-                        }
-                        for junction in rel.junctions
-                    ],
-                }
-                table_info["relationships_to"].append(rel_info)
-
-            # Records
-            for record in table.records:
-                record_info = {
-                    "id": record.id,
-                    "table_id": record.table_id,
-                    "data": record.data,
-                    "created_at": record.created_at.isoformat(),
-                    "updated_at": record.updated_at.isoformat(),
-                    "from_relationships": [
-                        {
-                            "id": junction.id,
-                            "relationship_id": junction.relationship_id,
-                            "to_record_id": junction.to_record_id,
-                            "attributes": junction.attributes,  # Already a dict
-                        }
-                        for junction in record.from_relationships
-                    ],
-                    "to_relationships": [
-                        {
-                            "id": junction.id,
-                            "relationship_id": junction.relationship_id,
-                            "from_record_id": junction.from_record_id,
-                            "attributes": junction.attributes,  # Already a dict
-                        }
-                        for junction in record.to_relationships
-                    ],
-                }
-                table_info["records"].append(record_info)
-
-            schema[table.name] = table_info
-
-        # Enums
-        enums = session.exec(select(EnumModel)).all()
-        enum_info = {}
-        for enum in enums:
-            enum_info[enum.name] = {
-                "id": enum.id,
-                "name": enum.name,
-                "values": [value.value for value in enum.values],
-                "columns": [column.name for column in enum.columns],
+    # Tagged by content, record writes change the body without bumping the version
+    # no-cache lets browsers keep the payload but revalidate it on every request
+    headers = {
+        "ETag": f'W/"{hashlib.blake2b(content, digest_size=16).hexdigest()}"',
+        "Cache-Control": "no-cache",
+    }
+    if if_none_match == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def _build_schema_definition(session: Session) -> dict[str, Any]:
+    """
+    Builds the tables, columns, relationships and enums of /current_schema/
+    The result is cached and shared between requests, never mutate it
+    """
+    # Columns, streamed and grouped by table in a single pass
+    columns_by_table = defaultdict(list)
+    for column in session.exec(
+        select(Column)
+        .order_by(Column.id)
+        .options(raiseload("*"))
+        .execution_options(yield_per=200)
+    ):
+        columns_by_table[column.table_id].append(
+            {
+                "id": column.id,
+                "name": column.name,
+                "data_type": column.data_type,
+                "constraints": column.constraints,
+                "enum_id": column.enum_id,
+                "required": column.required,
+                "unique": column.unique,
+                "searchable": column.searchable,
+                "created_at": column.created_at,
+                "updated_at": column.updated_at,
             }
+        )
 
-        return {"tables": schema, "enums": enum_info}
+    # Relationships, loaded once and bucketed by both of their tables
+    relationships_from = defaultdict(list)
+    relationships_to = defaultdict(list)
+    for rel in session.exec(
+        select(RelationshipModel)
+        .order_by(RelationshipModel.id)
+        .options(
+            selectinload(RelationshipModel.relationship_attributes),
+            raiseload("*"),
+        )
+    ):
+        relationships_from[rel.from_table_id].append(rel)
+        relationships_to[rel.to_table_id].append(rel)
+
+    schema = {}
+    tables = session.exec(
+        select(Table).order_by(Table.id).options(raiseload("*"))
+    ).all()
+    # Each relationship appears under both of its tables, build its lists once
+    rel_attributes: dict[int, list[dict[str, Any]]] = {}
+    for table in tables:
+        schema[table.name] = {
+            "id": table.id,
+            "name": table.name,
+            "columns": columns_by_table[table.id],
+            "relationships_from": [
+                _serialize_relationship(rel, "from", rel_attributes)
+                for rel in relationships_from[table.id]
+            ],
+            "relationships_to": [
+                _serialize_relationship(rel, "to", rel_attributes)
+                for rel in relationships_to[table.id]
+            ],
+        }
+
+    # Enums
+    enums = session.exec(
+        select(EnumModel)
+        .order_by(EnumModel.id)
+        .options(
+            selectinload(EnumModel.values),
+            selectinload(EnumModel.columns),
+            raiseload("*"),
+        )
+    ).all()
+    enum_info = {}
+    for enum in enums:
+        enum_info[enum.name] = {
+            "id": enum.id,
+            "name": enum.name,
+            "values": [value.value for value in enum.values],
+            "columns": [column.name for column in enum.columns],
+        }
+
+    return {"tables": schema, "enums": enum_info}
+
+
+def _add_schema_data(session: Session, definition: dict[str, Any]) -> dict[str, Any]:
+    """
+    Returns the full /current_schema/ payload, the cached definition plus the
+    current records and junctions
+    """
+    # Junctions, each listed under its relationship and both of its records
+    junctions_by_rel = defaultdict(list)
+    junctions_from = defaultdict(list)
+    junctions_to = defaultdict(list)
+    for junction in session.exec(
+        select(RelationshipJunctionModel)
+        .order_by(RelationshipJunctionModel.id)
+        .options(raiseload("*"))
+    ):
+        junctions_by_rel[junction.relationship_id].append(_serialize_junction(junction))
+        junctions_from[junction.from_record_id].append(
+            _serialize_junction(junction, "from")
+        )
+        junctions_to[junction.to_record_id].append(_serialize_junction(junction, "to"))
+
+    # Records, only the columns the payload needs
+    records_by_table = defaultdict(list)
+    for record_id, table_id, data, created_at, updated_at in session.exec(
+        select(
+            Record.id,
+            Record.table_id,
+            Record.data,
+            Record.created_at,
+            Record.updated_at,
+        )
+        .order_by(Record.id)
+        .execution_options(yield_per=1000)
+    ):
+        records_by_table[table_id].append(
+            {
+                "id": record_id,
+                "table_id": table_id,
+                "data": data,
+                "created_at": created_at,
+                "updated_at": updated_at,
+                "from_relationships": junctions_from.get(record_id, []),
+                "to_relationships": junctions_to.get(record_id, []),
+            }
+        )
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    tables = {}
+    for name, table in definition["tables"].items():
+        tables[name] = {
+            **table,
+            "relationships_from": [
+                {**rel, "junctions": junctions_by_rel.get(rel["id"], [])}
+                for rel in table["relationships_from"]
+            ],
+            "relationships_to": [
+                {**rel, "junctions": junctions_by_rel.get(rel["id"], [])}
+                for rel in table["relationships_to"]
+            ],
+            "records": records_by_table.get(table["id"], []),
+        }
+    return {"tables": tables, "enums": definition["enums"]}
+
+
+def _serialize_relationship(
+    rel: RelationshipModel, end: str, attributes_cache: dict[int, list[dict[str, Any]]]
+) -> dict[str, Any]:
+    """
+    Serializes a relationship as seen from its "from" or "to" table, without its
+    junctions
+    Only the table id of the opposite end is included, the attribute list is built
+    on first use and shared through attributes_cache
+    """
+    attributes = attributes_cache.get(rel.id)
+    if attributes is None:
+        attributes = attributes_cache[rel.id] = [
+            {
+                "id": attr.id,
+                "name": attr.name,
+                "data_type": attr.data_type,
+                "constraints": attr.constraints,
+            }
+            for attr in rel.relationship_attributes
+        ]
+    other_table_key = "to_table_id" if end == "from" else "from_table_id"
+    return {
+        "id": rel.id,
+        "name": rel.name,
+        "relationship_type": rel.relationship_type.value,
+        other_table_key: getattr(rel, other_table_key),
+        "attributes": attributes,
+    }
+
+
+def _serialize_junction(
+    junction: RelationshipJunctionModel, end: str | None = None
+) -> dict[str, Any]:
+    """
+    Serializes a junction row
+    When listed under a record's "from" or "to" end, that end's record id is omitted
+    """
+    junction_info = {"id": junction.id, "relationship_id": junction.relationship_id}
+    if end != "from":
+        junction_info["from_record_id"] = junction.from_record_id
+    if end != "to":
+        junction_info["to_record_id"] = junction.to_record_id
+    junction_info["attributes"] = junction.attributes  # Already a dict
+    return junction_info
@@ -1,92 +1,149 @@
-import asyncio
-import json
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+)
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, insert, select, update
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-
-from app.databases.database import get_session
+from app.databases.database import create_session, get_session
 from app.models.user import User
 from app.schemas.user import UserCreate, UserRead
-from app.websocket import manager
+from app.utils.responses import PydanticResponse, list_adapter
+from app.websocket import encode_event, manager
 
 router = APIRouter()
 
+# Built at import so the first request doesn't pay for the schema build
+_USER_LIST = list_adapter(UserRead)
+
+# Columns served as UserRead, rows selected from these are already valid
+_USER_READ_COLUMNS = (User.id, User.name, User.email, User.company_id)
+
 
 @router.post("/users/", response_model=UserRead)
-def create_user(user: UserCreate, session: Session = Depends(get_session)):
-    db_user = User.model_validate(user)
-    session.add(db_user)
+def create_user(
+    user: UserCreate,
+    background_tasks: BackgroundTasks,
+    session: Session = Depends(get_session),
+):
+    # One INSERT ... RETURNING instead of an INSERT followed by a refresh SELECT
+    statement = insert(User).values(**user.model_dump()).returning(*_USER_READ_COLUMNS)
     try:
+        db_user = session.exec(statement).one()
         session.commit()
-        session.refresh(db_user)
     except Exception as e:
         session.rollback()
         raise HTTPException(status_code=400, detail="User creation failed") from e
     # Broadcast data update
-    asyncio.create_task(
-        manager.broadcast(
-            json.dumps(
-                {
-                    "type": "data_update",
-                    "action": "create",
-                    "entity": "user",
-                    "id": db_user.id,
-                }
-            )
-        )
+    background_tasks.add_task(
+        manager.broadcast,
+        encode_event("data_update", "create", entity="user", id=db_user.id),
     )
-    return db_user
+    return PydanticResponse(UserRead.model_construct(**db_user._mapping))
 
 
 @router.get("/users/", response_model=list[UserRead])
-def read_users(session: Session = Depends(get_session)):
-    users = session.exec(select(User)).all()
-    return users
+def read_users(
+    request: Request,
+    after_id: int | None = None,
+    limit: int = Query(100, ge=1, le=1000, description="Page size, 100 by default"),
+    session: Session = Depends(get_session),
+):
+    """
+    Returns up to limit users (100 by default) ordered by id
+    When more users exist, the response carries a Link header with rel="next"
+    pointing at the next page, i.e. the same query with after_id set to the
+    last id returned
+    """
+    # Only the UserRead columns, returned as rows rather than User instances
+    # One extra row tells whether another page follows
+    statement = select(*_USER_READ_COLUMNS).order_by(User.id).limit(limit + 1)
+    if after_id is not None:
+        statement = statement.where(User.id > after_id)
+    # Stored rows were validated on write, skip revalidating every email
+    users = [
+        UserRead.model_construct(**row._mapping) for row in session.exec(statement)
+    ]
+    headers = {}
+    if len(users) > limit:
+        users = users[:limit]
+        next_url = request.url.include_query_params(after_id=users[-1].id, limit=limit)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return PydanticResponse(_USER_LIST.dump_json(users), headers=headers)
+
+
+@router.get("/users.ndjson")
+def stream_users():
+    """
+    Streams every user as newline delimited JSON, one UserRead object per line
+    """
+
+    def lines():
+        # Dependency sessions close before the body is sent, so the stream owns one
+        with create_session() as session:
+            result = session.exec(
+                select(*_USER_READ_COLUMNS)
+                .order_by(User.id)
+                .execution_options(yield_per=1000)
+            )
+            for rows in result.partitions():
+                yield b"".join(
+                    UserRead.model_construct(**row._mapping).model_dump_json().encode()
+                    + b"\n"
+                    for row in rows
+                )
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @router.get("/users/{user_id}", response_model=UserRead)
 def read_user(user_id: int, session: Session = Depends(get_session)):
-    user = session.get(User, user_id)
-    if not user:
+    user = session.exec(select(*_USER_READ_COLUMNS).where(User.id == user_id)).first()
+    if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return PydanticResponse(UserRead.model_construct(**user._mapping))
 
 
 @router.put("/users/{user_id}", response_model=UserRead)
 def update_user(
-    user_id: int, user: UserCreate, session: Session = Depends(get_session)
+    user_id: int,
+    user: UserCreate,
+    background_tasks: BackgroundTasks,
+    session: Session = Depends(get_session),
 ):
-    db_user = session.get(User, user_id)
-    if not db_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    user_data = user.dict(exclude_unset=True)
-    for key, value in user_data.items():
-        setattr(db_user, key, value)
-    session.add(db_user)
+    # One UPDATE ... RETURNING instead of loading the row, setting it and refreshing
+    statement = (
+        update(User)
+        .where(User.id == user_id)
+        .values(**user.model_dump(exclude_unset=True))
+        .returning(*_USER_READ_COLUMNS)
+    )
     try:
+        db_user = session.exec(statement).first()
         session.commit()
-        session.refresh(db_user)
     except Exception as e:
         session.rollback()
         raise HTTPException(status_code=400, detail="User update failed") from e
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
     # Broadcast data update
-    asyncio.create_task(
-        manager.broadcast(
-            json.dumps(
-                {
-                    "type": "data_update",
-                    "action": "update",
-                    "entity": "user",
-                    "id": db_user.id,
-                }
-            )
-        )
+    background_tasks.add_task(
+        manager.broadcast,
+        encode_event("data_update", "update", entity="user", id=user_id),
     )
-    return db_user
+    return PydanticResponse(UserRead.model_construct(**db_user._mapping))
 
 
 @router.delete("/users/{user_id}")
-def delete_user(user_id: int, session: Session = Depends(get_session)):
+def delete_user(
+    user_id: int,
+    background_tasks: BackgroundTasks,
+    session: Session = Depends(get_session),
+):
     user = session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -97,16 +154,8 @@ def delete_user(user_id: int, session: Session = Depends(get_session)):
         session.rollback()
         raise HTTPException(status_code=400, detail="User deletion failed") from e
     # Broadcast data update
-    asyncio.create_task(
-        manager.broadcast(
-            json.dumps(
-                {
-                    "type": "data_update",
-                    "action": "delete",
-                    "entity": "user",
-                    "id": user_id,
-                }
-            )
-        )
+    background_tasks.add_task(
+        manager.broadcast,
+        encode_event("data_update", "delete", entity="user", id=user_id),
     )
     return {"ok": True}
@@ -1,9 +1,12 @@
 import logging
 import os
 import secrets
+import time
+from functools import lru_cache
 from os import environ as env
 
-from fastapi import Depends, HTTPException, openapi, status
+import orjson
+from fastapi import Depends, HTTPException, Response, openapi, status
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from sqlmodel import Session, text
@@ -15,11 +18,28 @@ log = logging.getLogger(__name__)
 
 security = HTTPBasic()  # Basic Auth for API Docs
 
+# Seconds a DB probe result is reused, so bursts of health checks share one query
+HEALTH_PROBE_TTL = 1.0
+_last_probe: tuple[float, bool] = (float("-inf"), False)
+
+# Routes are fixed once the app has started, so the spec is built on first request
+_openapi_cache: bytes | None = None
+
+
+@lru_cache(maxsize=1)
+def _admin_credentials() -> tuple[bytes, bytes]:
+    """
+    Returns the encoded docs credentials, read from the environment on first use
+    """
+    return env["ADMIN_USER"].encode(), env["ADMIN_PASS"].encode()
+
 
 def get_current_username(credentials: HTTPBasicCredentials = Depends(security)):
-    correct_username = secrets.compare_digest(credentials.username, env["ADMIN_USER"])
-    correct_password = secrets.compare_digest(credentials.password, env["ADMIN_PASS"])
-    if not (correct_username and correct_password):
+    admin_user, admin_pass = _admin_credentials()
+    correct_username = secrets.compare_digest(credentials.username.encode(), admin_user)
+    correct_password = secrets.compare_digest(credentials.password.encode(), admin_pass)
+    # Bitwise & so both comparisons always run
+    if not (correct_username & correct_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -57,18 +77,20 @@ def health_check(db: Session = Depends(get_session)):
 
 
 def check_db_connection(db: Session):
+    global _last_probe
+    now = time.monotonic()
+    if now - _last_probe[0] < HEALTH_PROBE_TTL:
+        return _last_probe[1]
+
     try:
-        conn_count = db.exec(
-            text("SELECT COUNT(sa.*) FROM pg_catalog.pg_stat_activity sa")
-        ).first()
-        try:
-            log.info(f"{conn_count[0]} open connection(s).")
-        except Exception as e:
-            log.warning(f"Issue accessing connection count: {e}")
-        return True
+        # Liveness only, the connection count is refreshed in the background
+        db.exec(text("SELECT 1")).first()
+        result = True
     except Exception as e:
         log.error(f"DB health checks failed! {e}")
-        return False
+        result = False
+    _last_probe = (now, result)
+    return result
 
 
 @router.get("/docs", include_in_schema=False)
@@ -87,6 +109,11 @@ async def get_redoc(username: str = Depends(get_current_username)):
 
 @router.get("/openapi.json", include_in_schema=False)
 async def get_openapi(username: str = Depends(get_current_username)):
-    return openapi.utils.get_openapi(
-        title="Common App API Spec", version="0.1.0", routes=router.routes
-    )
+    global _openapi_cache
+    if _openapi_cache is None:
+        _openapi_cache = orjson.dumps(
+            openapi.utils.get_openapi(
+                title="Common App API Spec", version="0.1.0", routes=router.routes
+            )
+        )
+    return Response(content=_openapi_cache, media_type="application/json")
@@ -9,6 +9,10 @@ from .schema import ColumnCreate, ColumnRead, TableCreate, TableRead
 from .user import UserCreate, UserRead
 
 __all__ = [
+    "EnumCreate",
+    "EnumRead",
+    "EnumValueCreate",
+    "EnumValueRead",
     "TableCreate",
     "TableRead",
     "ColumnCreate",
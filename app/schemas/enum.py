@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class EnumValueCreate(BaseModel):
@@ -9,8 +9,7 @@ class EnumValueRead(BaseModel):
     id: int
     value: str
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class EnumCreate(BaseModel):
@@ -23,5 +22,4 @@ class EnumRead(BaseModel):
     name: str
     values: list[EnumValueRead] = []
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
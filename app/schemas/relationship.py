@@ -1,7 +1,7 @@
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class RelationshipType(str, Enum):
@@ -22,8 +22,7 @@ class RelationshipAttributeRead(BaseModel):
     data_type: str
     constraints: str | None = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class RelationshipCreate(BaseModel):
@@ -42,5 +41,4 @@ class RelationshipRead(BaseModel):
     relationship_type: RelationshipType
     attributes: list[RelationshipAttributeRead] = []
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
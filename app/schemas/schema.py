@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class ColumnCreate(BaseModel):
@@ -25,8 +25,7 @@ class ColumnRead(BaseModel):
     enum_id: int | None = None
     searchable: bool
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class TableCreate(BaseModel):
@@ -37,8 +36,7 @@ class TableRead(BaseModel):
     id: int
     name: str
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class RecordCreate(BaseModel):
@@ -52,5 +50,4 @@ class RecordRead(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
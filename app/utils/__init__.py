@@ -1,6 +1,10 @@
 from .elasticsearch import index_record, remove_record_from_index
+from .responses import PydanticResponse, dump_list_json, list_adapter
 
 __all__ = [
     "index_record",
     "remove_record_from_index",
+    "PydanticResponse",
+    "dump_list_json",
+    "list_adapter",
 ]
@@ -1,45 +1,168 @@
+import hashlib
 import logging
+import queue
+import threading
+import time
+from itertools import islice
 from typing import Any
 
+import orjson
+from elasticsearch.helpers import streaming_bulk
+
 from app.databases.database import es
 from app.models.record import Record
 
 log = logging.getLogger(__name__)
 
+# Single-record index/delete actions waiting for the bulk worker
+INDEX_QUEUE_SIZE = 10_000
+# How long the worker waits for more actions before sending a partial batch
+INDEX_FLUSH_SECONDS = 0.05
+INDEX_BATCH_SIZE = 500
+# How long a caller waits for room in a full queue before the action is dropped
+INDEX_ENQUEUE_TIMEOUT = 1.0
+
+_index_queue: queue.Queue[dict[str, Any] | None] = queue.Queue(INDEX_QUEUE_SIZE)
+_index_worker: threading.Thread | None = None
+_index_worker_lock = threading.Lock()
+# Actions dropped because the queue stayed full, see dropped_index_actions()
+_dropped_actions = 0
+_dropped_actions_lock = threading.Lock()
+
 
 def get_index_name(table_name: str) -> str:
     return f"records_{table_name.lower()}"
 
 
-def index_record(record: Record, searchable_data: dict[str, Any]):
-    index_name = get_index_name(record.table.name)
-    try:
-        es.index(
-            index=index_name,
-            id=record.id,
-            body={
+def index_record(table_name: str, record: Record, searchable_data: dict[str, Any]):
+    """
+    Queues the record for indexing, the bulk worker sends it in the background
+    """
+    _enqueue(
+        {
+            "_index": get_index_name(table_name),
+            "_id": record.id,
+            "_source": {
                 "table_id": record.table_id,
                 "data": searchable_data,
-                "created_at": record.created_at.isoformat(),
-                "updated_at": record.updated_at.isoformat(),
+                "created_at": record.created_at,
+                "updated_at": record.updated_at,
             },
+        }
+    )
+
+
+def remove_record_from_index(table_name: str, record_id: int):
+    """
+    Queues the record's removal from its table's index
+    """
+    _enqueue(
+        {"_op_type": "delete", "_index": get_index_name(table_name), "_id": record_id}
+    )
+
+
+def _enqueue(action: dict[str, Any]):
+    global _index_worker, _dropped_actions
+    if _index_worker is None:
+        with _index_worker_lock:
+            if _index_worker is None:
+                _index_worker = threading.Thread(
+                    target=_run_index_worker, name="es-index-worker", daemon=True
+                )
+                _index_worker.start()
+    try:
+        _index_queue.put_nowait(action)
+        return
+    except queue.Full:
+        pass
+    # Back off briefly rather than lose the action, this throttles the writer
+    try:
+        _index_queue.put(action, timeout=INDEX_ENQUEUE_TIMEOUT)
+    except queue.Full:
+        with _dropped_actions_lock:
+            _dropped_actions += 1
+            dropped = _dropped_actions
+        log.error(
+            f"Index queue full, dropped action for record {action['_id']} "
+            f"({dropped} dropped since startup, reindex the table to recover)"
         )
-        log.info(f"Indexed record {record.id} in Elasticsearch index '{index_name}'")
-    except Exception as e:
-        log.error(f"Failed to index record {record.id}: {e}")
 
 
-def remove_record_from_index(record: Record):
-    index_name = get_index_name(record.table.name)
+def dropped_index_actions() -> int:
+    """
+    Returns how many index/delete actions were dropped on a full queue
+    """
+    return _dropped_actions
+
+
+def _run_index_worker():
+    """
+    Sends queued actions with the bulk API, one request per batch
+    A batch closes at INDEX_BATCH_SIZE actions or INDEX_FLUSH_SECONDS after it opened
+    """
+    stopping = False
+    while not stopping:
+        action = _index_queue.get()
+        if action is None:
+            break
+        actions = [action]
+        deadline = time.monotonic() + INDEX_FLUSH_SECONDS
+        while len(actions) < INDEX_BATCH_SIZE:
+            try:
+                action = _index_queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if action is None:
+                stopping = True
+                break
+            actions.append(action)
+        _send_actions(actions)
+
+
+def _send_actions(actions: list[dict[str, Any]]):
     try:
-        es.delete(index=index_name, id=record.id)
-        log.info(f"Removed record {record.id} from Elasticsearch index '{index_name}'")
+        for ok, info in streaming_bulk(
+            es,
+            actions,
+            chunk_size=INDEX_BATCH_SIZE,
+            max_chunk_bytes=5 * 1024 * 1024,
+            raise_on_error=False,
+            raise_on_exception=False,
+        ):
+            # Deleting a document that was never indexed is not an error
+            if not ok and info.get("delete", {}).get("status") != 404:
+                log.error(f"Elasticsearch bulk action failed: {info}")
     except Exception as e:
-        log.error(f"Failed to remove record {record.id}: {e}")
+        log.error(f"Failed to send {len(actions)} Elasticsearch action(s): {e}")
+
+
+def flush_index_queue(timeout: float = 10.0):
+    """
+    Sends whatever is still queued and stops the bulk worker
+    Called at app shutdown
+    """
+    global _index_worker
+    with _index_worker_lock:
+        worker, _index_worker = _index_worker, None
+    if worker is None:
+        return
+    try:
+        _index_queue.put(None, timeout=timeout)
+    except queue.Full:
+        log.warning("Index queue still full at shutdown, pending actions dropped")
+        return
+    worker.join(timeout)
 
 
-def index_existing_records(table_id: int, column_name: str):
-    from sqlmodel import Session, select
+def index_existing_records(
+    table_id: int, column_name: str | None = None, force: bool = False
+):
+    """
+    Indexes the table's records on every searchable field plus column_name
+    Records whose document matches their stored indexed_hash are skipped unless
+    force is set, which resends everything, e.g. after the index lost data
+    """
+    from sqlmodel import Session, select, update
 
     from app.databases.database import get_engine
     from app.models.record import Record
@@ -51,22 +174,120 @@ def index_existing_records(table_id: int, column_name: str):
         if not table:
             log.error(f"Table with id {table_id} not found for indexing.")
             return
-        column = session.exec(
-            select(Column).where(
-                Column.table_id == table_id, Column.name == column_name
-            )
-        ).first()
-        if not column:
-            log.error(
-                f"Column '{column_name}' not found in table '{table.name}' for indexing."
+        if column_name is not None:
+            column = session.exec(
+                select(Column).where(
+                    Column.table_id == table_id, Column.name == column_name
+                )
+            ).first()
+            if not column:
+                log.error(
+                    f"Column '{column_name}' not found in table '{table.name}' "
+                    "for indexing."
+                )
+                return
+
+        # Index every searchable field, documents are replaced as a whole
+        searchable_fields = set(
+            session.exec(
+                select(Column.name).where(
+                    Column.table_id == table_id, Column.searchable == True
+                )
+            ).all()
+        )
+        if column_name is not None:
+            searchable_fields.add(column_name)
+        index_name = get_index_name(table.name)
+
+        # Digests of documents sent in this run, keyed by record id
+        sent_hashes: dict[int, bytes] = {}
+
+        def actions():
+            # Only the columns the document needs, streamed from a server-side cursor
+            rows = session.exec(
+                select(
+                    Record.id,
+                    Record.data,
+                    Record.created_at,
+                    Record.updated_at,
+                    Record.indexed_hash,
+                )
+                .where(Record.table_id == table.id)
+                .execution_options(yield_per=1000)
             )
-            return
+            for record_id, data, created_at, updated_at, indexed_hash in rows:
+                searchable_data = {
+                    key: data[key] for key in searchable_fields if data.get(key)
+                }
+                if not searchable_data:
+                    continue
+                source = {
+                    "table_id": table_id,
+                    "data": searchable_data,
+                    "created_at": created_at,
+                    "updated_at": updated_at,
+                }
+                # Skip documents identical to the last ones indexed for the record
+                digest = _document_hash(source)
+                if not force and indexed_hash == digest:
+                    continue
+                sent_hashes[record_id] = digest
+                yield {"_index": index_name, "_id": record_id, "_source": source}
+
+        # Bulk requests of up to 500 documents or 10MB, streamed as records are read.
+        # Per-document failures come back from streaming_bulk, a transport error
+        # fails its whole chunk, so each chunk is sent on its own and the run
+        # carries on with the next one
+        indexed_hashes = []
+        pending = actions()
+        # Large backfills get a longer timeout than regular requests
+        bulk_client = es.options(request_timeout=60)
+        try:
+            while chunk := list(islice(pending, 500)):
+                try:
+                    for ok, info in streaming_bulk(
+                        bulk_client,
+                        chunk,
+                        chunk_size=500,
+                        max_chunk_bytes=10 * 1024 * 1024,
+                        raise_on_error=False,
+                        raise_on_exception=False,
+                    ):
+                        record_id = int(info["index"]["_id"])
+                        digest = sent_hashes.pop(record_id, None)
+                        if ok:
+                            indexed_hashes.append(
+                                {"id": record_id, "indexed_hash": digest}
+                            )
+                        else:
+                            log.error(
+                                f"Failed to index record in '{index_name}': {info}"
+                            )
+                except Exception as e:
+                    for action in chunk:
+                        sent_hashes.pop(action["_id"], None)
+                    log.error(
+                        f"Failed to send {len(chunk)} record(s) to '{index_name}': {e}"
+                    )
+        except Exception as e:
+            log.error(f"Reindexing '{index_name}' stopped early: {e}")
+
+        # Hashes of whatever did get indexed are kept even if the run stopped early
+        if indexed_hashes:
+            try:
+                # Ends the read transaction, which may have failed mid-stream
+                session.rollback()
+                session.exec(update(Record), params=indexed_hashes)
+                session.commit()
+            except Exception as e:
+                log.error(f"Failed to store index hashes for '{index_name}': {e}")
+        log.info(
+            f"Indexed {len(indexed_hashes)} record(s) in Elasticsearch index "
+            f"'{index_name}'"
+        )
+
 
-        records = session.exec(select(Record).where(Record.table_id == table.id)).all()
-        searchable_data_key = column.name
-        for record in records:
-            searchable_data = {
-                searchable_data_key: record.data.get(searchable_data_key)
-            }
-            if searchable_data.get(searchable_data_key):
-                index_record(record, searchable_data)
+def _document_hash(source: dict[str, Any]) -> bytes:
+    return hashlib.blake2b(
+        orjson.dumps(source, option=orjson.OPT_SORT_KEYS), digest_size=16
+    ).digest()
@@ -0,0 +1,37 @@
+from functools import lru_cache
+from typing import Any, Iterable
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+
+class PydanticResponse(Response):
+    """
+    JSON response rendered directly by pydantic's serializer
+    Returning one bypasses FastAPI's response_model revalidation and jsonable_encoder,
+    keep response_model on the route so the OpenAPI docs still describe the body
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode()
+        return content
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: type[BaseModel]) -> TypeAdapter:
+    """
+    Returns the shared TypeAdapter for list[model], built once per model
+    """
+    return TypeAdapter(list[model])
+
+
+def dump_list_json(model: type[BaseModel], objs: Iterable[Any]) -> bytes:
+    """
+    Validates ORM objects as a list of model and serializes them in one pass
+    Pass the result to PydanticResponse
+    """
+    adapter = list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(objs, from_attributes=True))
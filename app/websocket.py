@@ -1,73 +1,298 @@
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
-from jose import JWTError, jwt
+import asyncio
+import hashlib
+import logging
+import time
+from functools import lru_cache
+from os import environ
+from typing import Any
+
+import orjson
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from jwt import DecodeError, InvalidTokenError
 from sqlmodel import Session, select
 
-from app.databases.database import get_session
+from app.databases.database import create_session
 from app.models.user import User
-from app.routers.auth import ALGORITHM, SECRET_KEY
+from app.routers.auth import decode_access_token
+
+log = logging.getLogger(__name__)
+
+# Broadcasts issued within this window are coalesced into a single frame
+BROADCAST_WINDOW_SECONDS = 0.005
+
+# Frames buffered per connection before a client is considered too slow and dropped
+CONNECTION_QUEUE_SIZE = int(environ.get("WS_QUEUE_SIZE", 32))
+
+# Connections beyond this are turned away with 1013 (try again later)
+MAX_CONNECTIONS = int(environ.get("WS_MAX_CONNECTIONS", 10_000))
+
+# Most queued frames a lagging connection merges into one send
+MAX_FRAMES_PER_SEND = 16
+
+# Verified tokens are trusted for this long (capped at their exp) before re-decoding
+TOKEN_CACHE_TTL_SECONDS = 60
+TOKEN_CACHE_SIZE = 10_000
+
+# Token digest -> (user id, expiry as a unix timestamp)
+_token_cache: dict[bytes, tuple[int, float]] = {}
+
+# Malformed or badly signed tokens are rejected without re-verifying for this long,
+# the cache only absorbs tight retry loops
+BAD_TOKEN_TTL_SECONDS = 5
+BAD_TOKEN_CACHE_SIZE = 4096
+
+# Token digest -> expiry as a unix timestamp
+_bad_tokens: dict[bytes, float] = {}
+
+_BATCH_PREFIX = '{"type":"batch","events":['
+_BATCH_SUFFIX = "]}"
+
 
-router = APIRouter()
+def _batch_frame(events: list[str]) -> str:
+    return _BATCH_PREFIX + ",".join(events) + _BATCH_SUFFIX
+
+
+def _frame_events(frame: str) -> str:
+    """
+    Returns the comma separated events carried by a frame, unwrapping batches
+    """
+    if frame.startswith(_BATCH_PREFIX):
+        return frame[len(_BATCH_PREFIX) : -len(_BATCH_SUFFIX)]
+    return frame
 
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        self.active_connections: set[WebSocket] = set()
+        self._queues: dict[WebSocket, asyncio.Queue[str]] = {}
+        self._relays: dict[WebSocket, asyncio.Task] = {}
+        self._closing: set[asyncio.Task] = set()
+        self._pending: list[str] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket) -> bool:
+        """
+        Accepts the connection and starts its relay
+        Returns False, after closing it, if the server is already at MAX_CONNECTIONS
+        """
         await websocket.accept()
-        self.active_connections.append(websocket)
-        print("WebSocket connected")
+        if len(self.active_connections) >= MAX_CONNECTIONS:
+            log.warning("WebSocket connection limit reached, turning client away")
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return False
+        queue = asyncio.Queue(maxsize=CONNECTION_QUEUE_SIZE)
+        self.active_connections.add(websocket)
+        self._queues[websocket] = queue
+        self._relays[websocket] = asyncio.create_task(self._relay(websocket, queue))
+        log.debug("WebSocket connected")
+        return True
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        print("WebSocket disconnected")
+        relay = self._drop(websocket)
+        if relay is not None:
+            relay.cancel()
+            log.debug("WebSocket disconnected")
+
+    def _drop(self, websocket: WebSocket) -> asyncio.Task | None:
+        self.active_connections.discard(websocket)
+        self._queues.pop(websocket, None)
+        return self._relays.pop(websocket, None)
+
+    async def _relay(self, websocket: WebSocket, queue: asyncio.Queue[str]):
+        """
+        Drains one connection's queue, so a slow client only ever delays itself
+        Frames that piled up while a send was in flight go out merged as one batch
+        """
+        while True:
+            frame = await queue.get()
+            if not queue.empty():
+                frames = [frame]
+                while not queue.empty() and len(frames) < MAX_FRAMES_PER_SEND:
+                    frames.append(queue.get_nowait())
+                frame = _batch_frame([_frame_events(f) for f in frames])
+            try:
+                await websocket.send_text(frame)
+            except Exception as e:
+                log.warning(f"WebSocket send failed: {e}")
+                self._drop(websocket)
+                return
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        """
+        Queues a JSON message for every connection
+        Messages queued within BROADCAST_WINDOW_SECONDS go out together as one
+        {"type": "batch", "events": [...]} frame, a lone message is sent as is
+        """
+        self._pending.append(message)
+        if self._flush_handle is None:
+            # Fanning out is just queue puts, a timer callback is enough
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                BROADCAST_WINDOW_SECONDS, self._flush
+            )
+
+    def _flush(self):
+        messages, self._pending = self._pending, []
+        self._flush_handle = None
+
+        if len(messages) == 1:
+            frame = messages[0]
+        else:
+            frame = _batch_frame(messages)
+
+        for websocket, queue in list(self._queues.items()):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Disconnect the laggard, it refetches everything when it reconnects
+                log.warning("WebSocket client is not keeping up, disconnecting")
+                self.disconnect(websocket)
+                task = asyncio.create_task(
+                    websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                )
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
 
 
 manager = ConnectionManager()
 
 
-def decode_token(token: str, session: Session) -> User:
+@lru_cache(maxsize=None)
+def _event_prefix(event_type: str, action: str) -> bytes:
+    # '{"type":...,"action":...' without the closing brace
+    return orjson.dumps({"type": event_type, "action": action})[:-1]
+
+
+def encode_event(event_type: str, action: str, **fields: Any) -> str:
+    """
+    Serializes a broadcast event, only the dynamic fields are encoded per call
+    """
+    prefix = _event_prefix(event_type, action)
+    if not fields:
+        return (prefix + b"}").decode()
+    return (prefix + b"," + orjson.dumps(fields)[1:]).decode()
+
+
+def _token_key(token: str) -> bytes:
+    """
+    Digest of the token, computed once per handshake and shared by both caches
+    """
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def _get_cached(key: bytes, now: float) -> int | None:
+    cached = _token_cache.get(key)
+    if cached is None:
+        return None
+    user_id, expires_at = cached
+    if now < expires_at:
+        return user_id
+    _token_cache.pop(key, None)
+    return None
+
+
+def _cache_user(key: bytes, user_id: int, expires_at: float):
+    if len(_token_cache) >= TOKEN_CACHE_SIZE:
+        # Keeps memory bounded, a full cache simply starts over
+        _token_cache.clear()
+    _token_cache[key] = (user_id, expires_at)
+
+
+def _is_bad(key: bytes, now: float) -> bool:
+    return now < _bad_tokens.get(key, 0)
+
+
+def _cache_bad(key: bytes, now: float):
+    if len(_bad_tokens) >= BAD_TOKEN_CACHE_SIZE:
+        _bad_tokens.clear()
+    _bad_tokens[key] = now + BAD_TOKEN_TTL_SECONDS
+
+
+def decode_token(token: str, session: Session) -> int:
+    """
+    Returns the id of the token's user, only the id column is ever loaded
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials for WebSocket connection",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    key = _token_key(token)
+    now = time.time()
+    user_id = _get_cached(key, now)
+    if user_id is not None:
+        # Signature already verified, only check the user still exists
+        if session.scalar(select(User.id).where(User.id == user_id)) is None:
+            _token_cache.pop(key, None)
+            raise credentials_exception
+        return user_id
+    if _is_bad(key, now):
+        raise credentials_exception
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-    except JWTError:
+    except DecodeError:
+        # Malformed or badly signed (InvalidSignatureError is a DecodeError), these
+        # can never become valid. Expired or not-yet-valid tokens are not cached
+        _cache_bad(key, now)
+        raise credentials_exception
+    except InvalidTokenError:
         raise credentials_exception
-    user = session.exec(select(User).where(User.name == username)).first()
-    if user is None:
+    user_id = session.scalar(select(User.id).where(User.name == username))
+    if user_id is None:
         raise credentials_exception
-    return user
+
+    # Only successful validations are cached
+    _cache_user(key, user_id, min(now + TOKEN_CACHE_TTL_SECONDS, payload["exp"]))
+    return user_id
+
+
+def _authenticate(token: str) -> int:
+    """
+    Resolves the token's user id, the session is only held for the lookup
+    """
+    with create_session() as session:
+        return decode_token(token, session)
+
+
+def _handshake_token(websocket: WebSocket) -> str | None:
+    """
+    Returns the bearer token from the Authorization header
+    Falls back to the ?token= query parameter, browsers cannot set headers on a
+    WebSocket handshake
+    """
+    authorization = websocket.headers.get("authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        return authorization[7:]
+    return websocket.query_params.get("token")
 
 
-@router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    token = websocket.query_params.get("token")
+    token = _handshake_token(websocket)
     if not token:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
-    session = next(get_session())
     try:
-        user = decode_token(token, session)
+        # The user lookup is blocking DB I/O, keep it off the event loop
+        user_id = await run_in_threadpool(_authenticate, token)
     except HTTPException:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
+    websocket.state.user_id = user_id
 
-    await manager.connect(websocket)
+    if not await manager.connect(websocket):
+        return
     try:
         while True:
-            data = await websocket.receive_text()
-            # Handle incoming data if needed
+            # Incoming frames are not used, read the raw message without decoding
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     finally:
-        session.close()
+        # Always release the relay task, whatever ended the receive loop
+        manager.disconnect(websocket)
@@ -15,7 +15,12 @@ const useWebSocket = (onMessage: MessageHandler) => {
         ws.onmessage = event => {
             try {
                 const message = JSON.parse(event.data);
-                onMessage(message);
+                // Bursts of updates arrive coalesced into a single batch frame
+                if (message.type === 'batch') {
+                    message.events.forEach(onMessage);
+                } else {
+                    onMessage(message);
+                }
             } catch (error) {
                 console.error('Error parsing WebSocket message:', error);
             }
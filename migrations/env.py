@@ -4,7 +4,7 @@ from os import environ
 from alembic import context
 from alembic.config import Config
 from dotenv import load_dotenv
-from sqlalchemy import engine_from_config, pool
+from sqlalchemy import create_engine, pool
 from sqlmodel import SQLModel
 
 load_dotenv(override=True)
@@ -39,8 +39,7 @@ target_metadata = SQLModel.metadata
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
 # ... etc.
-DATABASE_URL = f"postgresql+psycopg2://{environ['DB_USER']}:{environ['DB_PASS']}@{environ['DB_HOST']}:{environ['DB_PORT']}/{environ['DB_NAME']}"  # [?key=value&key=value...]"
-config.set_main_option("sqlalchemy.url", DATABASE_URL)
+DATABASE_URL = "postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}".format_map(environ)  # [?key=value&key=value...]"
 
 
 def include_object(object, name, type_, reflected, compare_to):
@@ -82,12 +81,8 @@ def run_migrations_online() -> None:
 
     """
 
-    # print(config.get_section(config.config_ini_section))
-    connectable = engine_from_config(
-        config.get_section(config.config_ini_section),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
+    # The URL goes straight to the engine, not through the ini section
+    connectable = create_engine(DATABASE_URL, poolclass=pool.NullPool)
 
     with connectable.connect() as connection:
         context.configure(
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 
 DEV = "dev"
 TEST = "test"
@@ -16,15 +17,15 @@ LOCAL_ENVS = {DEV, TEST}
 HOSTED_ENVS = {QA, STAGING, PROD}
 
 
-@staticmethod
+@lru_cache(maxsize=1)
 def get_env() -> str:
     """
     Returns the current environment, defaulting to dev
+    Read once, ENVIRONMENT does not change at runtime
     """
     return os.environ.get("ENVIRONMENT", DEV)
 
 
-@staticmethod
 def is_prod() -> bool:
     """
     Returns True if the current environment is prod
@@ -32,7 +33,6 @@ def is_prod() -> bool:
     return get_env() == PROD
 
 
-@staticmethod
 def is_nonprod() -> bool:
     """
     Returns True if the current environment is not prod